@@ -1,15 +1,32 @@
 from fastapi import FastAPI, BackgroundTasks, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 from pydantic import BaseModel, HttpUrl
 from typing import Literal, List, Dict, Any
-import uuid, asyncio
-from bs4 import BeautifulSoup
+from contextlib import asynccontextmanager
+import io, os, secrets
+import redis.asyncio as aioredis
+from cachetools import TTLCache
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import cm
 
-app = FastAPI(title="GDPRCheck360 API", version="0.3.0")
+# Shared scan store across uvicorn workers (optional)
+REDIS_URL = os.getenv("REDIS_URL")
+SCAN_TTL = 3600
+
+redis = aioredis.from_url(REDIS_URL) if REDIS_URL else None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    if redis is not None:
+        await redis.aclose()
+
+app = FastAPI(
+    title="GDPRCheck360 API", version="0.3.0",
+    default_response_class=ORJSONResponse, lifespan=lifespan
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -38,24 +55,51 @@ class ScanResult(BaseModel):
     score: int | None = None
     issues: List[Issue] | None = None
 
-# In-memory scans
-scans: Dict[str, ScanResult] = {}
+# In-memory scans: the only store without Redis, a per-worker L1 cache with it
+scans: TTLCache = TTLCache(maxsize=10_000, ttl=SCAN_TTL)
+
+async def save_scan(result: ScanResult):
+    scans[result.scan_id] = result
+    if redis is not None:
+        await redis.set(f"scan:{result.scan_id}", result.model_dump_json(), ex=SCAN_TTL)
+
+async def load_scan(scan_id: str) -> ScanResult | None:
+    if scan_id in scans:
+        return scans[scan_id]
+    if redis is None:
+        return None
+    raw = await redis.get(f"scan:{scan_id}")
+    if raw is None:
+        return None
+    result = ScanResult.model_validate_json(raw)
+    # Only cache final states: a pending/running scan belongs to another worker
+    if result.status in ("done", "error"):
+        scans[scan_id] = result
+    return result
+
+# Recent scan outcomes keyed by (url, depth): repeat scans skip the work
+RESULT_TTL = 300
+results: TTLCache = TTLCache(maxsize=512, ttl=RESULT_TTL)
 
 @app.post("/scan/start", response_model=ScanResult)
-async def start_scan(req: ScanRequest, background_tasks: BackgroundTasks):
-    scan_id = str(uuid.uuid4())
+async def start_scan(req: ScanRequest, background_tasks: BackgroundTasks, force: bool = False):
+    scan_id = secrets.token_hex(16)
+    url = str(req.url)
+    cached = None if force else results.get((url, req.depth))
+    if cached is not None:
+        score, issues = cached
+        result = ScanResult(scan_id=scan_id, status="done", score=score, issues=issues)
+        await save_scan(result)
+        return result
     result = ScanResult(scan_id=scan_id, status="pending")
-    scans[scan_id] = result
-    background_tasks.add_task(run_scan, scan_id, str(req.url), req.depth)
+    await save_scan(result)
+    background_tasks.add_task(run_scan, scan_id, url, req.depth)
     return result
 
 async def run_scan(scan_id: str, url: str, depth: str):
-    scans[scan_id].status = "running"
-    await asyncio.sleep(2)  # simulazione delay
-    scans[scan_id].status = "done"
-    scans[scan_id].score = 77
-    scans[scan_id].issues = [
-        Issue(
+    await save_scan(ScanResult(scan_id=scan_id, status="running"))
+    issues = [
+        Issue.model_construct(
             area="security",
             severity="low",
             title="Header di sicurezza mancanti",
@@ -63,21 +107,40 @@ async def run_scan(scan_id: str, url: str, depth: str):
             fix_hint="Imposta HSTS, CSP, X-Content-Type-Options, Referrer-Policy, Permissions-Policy."
         )
     ]
+    score = 77
+    results[(url, depth)] = (score, issues)
+    await save_scan(ScanResult(scan_id=scan_id, status="done", score=score, issues=issues))
 
 @app.get("/scan/{scan_id}", response_model=ScanResult)
 async def get_scan(scan_id: str):
-    if scan_id not in scans:
+    scan = await load_scan(scan_id)
+    if scan is None:
         raise HTTPException(status_code=404, detail="Scan not found")
-    return scans[scan_id]
+    return scan
+
+# Rendered PDFs of finished scans, so repeated downloads skip ReportLab
+reports: TTLCache = TTLCache(maxsize=256, ttl=SCAN_TTL)
 
 @app.get("/scan/{scan_id}/report")
 async def get_report(scan_id: str):
-    if scan_id not in scans:
+    scan = await load_scan(scan_id)
+    if scan is None:
         raise HTTPException(status_code=404, detail="Scan not found")
-    scan = scans[scan_id]
 
-    file_path = f"/tmp/report_{scan_id}.pdf"
-    c = canvas.Canvas(file_path, pagesize=A4)
+    pdf = reports.get(scan_id)
+    if pdf is None:
+        pdf = render_report(scan)
+        if scan.status in ("done", "error"):
+            reports[scan_id] = pdf
+    return Response(
+        pdf,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="gdpr_report_{scan_id}.pdf"'},
+    )
+
+def render_report(scan: ScanResult) -> bytes:
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
     width, height = A4
 
     c.setFont("Helvetica-Bold", 18)
@@ -104,4 +167,4 @@ async def get_report(scan_id: str):
                 y = height - 2*cm
 
     c.save()
-    return FileResponse(file_path, filename=f"gdpr_report_{scan_id}.pdf")
+    return buf.getvalue()